@@ -1,9 +1,47 @@
 import pandas as pd
+import numpy as np
 import re
 import io
-from typing import Dict, List, Optional, Tuple
+import csv
+import functools
+import hashlib
+from typing import Dict, List, Optional, TextIO, Tuple, Union
 from dataclasses import dataclass
 
+# Strips everything but letters and digits when normalizing headers
+_NORM_RE = re.compile(r'[^a-zA-Z0-9]')
+
+# Characters hashed per step when fingerprinting an upload
+_HASH_CHUNK_SIZE = 1 << 20
+
+# Number of distinct header rows whose mapping is kept
+_HEADER_CACHE_SIZE = 64
+
+# Exact headers that identify the old Stan CSV format
+_OLD_FORMAT_FIELDS = frozenset({'Total Amount', 'Date', 'Product Name', 'Customer ID', 'Order ID'})
+
+# Low-cardinality string fields stored as categoricals (integer codes + small dictionary)
+_CATEGORICAL_FIELDS = frozenset({'product_name', 'payment_status', 'payment_method', 'product_type', 'referral_source'})
+
+# Backward compatibility aliases: internal field name -> legacy header
+_COMPAT_ALIASES = {
+    'total_amount': 'Total Amount',
+    'date': 'Date',
+    'product_name': 'Product Name',
+    'customer_name': 'Customer Name',
+    'customer_email': 'Customer Email',
+    'order_id': 'Order ID',
+    'customer_id': 'Customer ID',
+    'quantity': 'Quantity',
+    'product_price': 'Product Price',
+    'tax_amount': 'Tax Amount',
+    'payment_status': 'Payment Status',
+    'payment_method': 'Payment Method',
+    'referral_source': 'Referral Source'
+}
+# Reverse direction for old-format CSVs: legacy header -> internal field name
+_LEGACY_ALIASES = {old_name: new_name for new_name, old_name in _COMPAT_ALIASES.items()}
+
 @dataclass
 class FieldMapping:
     """Represents a mapping between CSV headers and internal field names"""
@@ -11,167 +49,201 @@ class FieldMapping:
     internal_field: str     # Standardized internal field name
     required: bool = False  # Whether this field is required
     data_type: str = "string"  # Expected data type
+    
+    def __post_init__(self):
+        # Precomputed variant sets for O(1) membership checks
+        self._exact = frozenset(h.lower() for h in self.csv_headers)
+        self._norm = frozenset(_NORM_RE.sub('', h.lower()) for h in self.csv_headers)
+
+# Field mappings with multiple possible header variations, shared by every mapper
+_FIELD_MAPPINGS = (
+    FieldMapping(
+        csv_headers=["Customer ID", "customer_id", "customerid", "CustomerID", "customer", "id"],
+        internal_field="customer_id",
+        required=True
+    ),
+    FieldMapping(
+        csv_headers=["Order ID", "order_id", "orderid", "OrderID", "order", "transaction_id", "Transaction ID"],
+        internal_field="order_id",
+        required=True
+    ),
+    FieldMapping(
+        csv_headers=["Date", "date", "created_date", "Created Date", "order_date", "Order Date", "timestamp"],
+        internal_field="date",
+        required=True,
+        data_type="datetime"
+    ),
+    FieldMapping(
+        csv_headers=["Time", "time", "created_time", "Created Time", "order_time", "Order Time"],
+        internal_field="time",
+        data_type="time"
+    ),
+    FieldMapping(
+        csv_headers=["Product Name", "product_name", "productname", "ProductName", "item", "Item Name", "product", "Product"],
+        internal_field="product_name",
+        required=True
+    ),
+    FieldMapping(
+        csv_headers=["Product Type", "product_type", "category", "Category", "type", "Type"],
+        internal_field="product_type",
+        data_type="str",
+        required=False
+    ),
+    FieldMapping(
+        csv_headers=["Product Price", "product_price", "productprice", "ProductPrice", "price", "unit_price", "Unit Price"],
+        internal_field="product_price",
+        data_type="float"
+    ),
+    FieldMapping(
+        csv_headers=["Quantity", "quantity", "qty", "Qty"],
+        internal_field="quantity",
+        data_type="int"
+    ),
+    FieldMapping(
+        csv_headers=["Subtotal", "subtotal", "Sub Total", "sub_total"],
+        internal_field="subtotal",
+        data_type="float"
+    ),
+    FieldMapping(
+        csv_headers=["Discount Amount", "discount_amount", "discountamount", "DiscountAmount", "discount", "Discount"],
+        internal_field="discount_amount",
+        data_type="float"
+    ),
+    FieldMapping(
+        csv_headers=["Total Amount", "total_amount", "totalamount", "TotalAmount", "total", "Total"],
+        internal_field="total_amount",
+        required=True,
+        data_type="float"
+    ),
+    FieldMapping(
+        csv_headers=["Tax Amount", "tax_amount", "taxamount", "TaxAmount", "tax", "Tax"],
+        internal_field="tax_amount",
+        data_type="float"
+    ),
+    FieldMapping(
+        csv_headers=["amount", "Amount"],
+        internal_field="total_amount",
+        data_type="float"
+    ),
+
+    FieldMapping(
+        csv_headers=["Customer Name", "customer_name", "customername", "CustomerName", "name", "Name", "Full Name", "full_name", "fullname"],
+        internal_field="customer_name"
+    ),
+    FieldMapping(
+        csv_headers=["Customer Email", "customer_email", "customeremail", "CustomerEmail", "email", "Email"],
+        internal_field="customer_email"
+    ),
+    FieldMapping(
+        csv_headers=["Payment Status", "payment_status", "paymentstatus", "PaymentStatus", "status", "Status"],
+        internal_field="payment_status"
+    ),
+    FieldMapping(
+        csv_headers=["Payment Method", "payment_method", "paymentmethod", "PaymentMethod", "method", "Method"],
+        internal_field="payment_method"
+    ),
+    FieldMapping(
+        csv_headers=["Referral Source", "referral_source", "referralsource", "ReferralSource", "source", "Source"],
+        internal_field="referral_source"
+    ),
+    # Stripe-specific fields
+    FieldMapping(
+        csv_headers=["Amount (in cents)", "amount_cents"],
+        internal_field="amount",
+        data_type="float"
+    ),
+    FieldMapping(
+        csv_headers=["Net Revenue", "net_revenue", "net_amount", "Net Amount"],
+        internal_field="net_amount",
+        data_type="float"
+    ),
+    FieldMapping(
+        csv_headers=["Amount Refunded", "amount_refunded", "amountrefunded", "AmountRefunded", "refunded"],
+        internal_field="amount_refunded",
+        data_type="float"
+    ),
+    FieldMapping(
+        csv_headers=["Fee", "fee", "Fee Amount", "fee_amount"],
+        internal_field="fee",
+        data_type="float"
+    ),
+    FieldMapping(
+        csv_headers=["Net", "net", "Net Amount", "net_amount"],
+        internal_field="net",
+        data_type="float"
+    ),
+    FieldMapping(
+        csv_headers=["Created (UTC)", "created_utc", "created", "Created", "created_at"],
+        internal_field="created_utc",
+        data_type="datetime"
+    )
+)
+
+def _build_header_lookup() -> Dict[str, str]:
+    """Header lookup table: normalized or lowercased variant -> internal field"""
+    # First mapping wins, matching the order of _FIELD_MAPPINGS
+    lookup = {}
+    for field_mapping in _FIELD_MAPPINGS:
+        for normalized in field_mapping._norm:
+            lookup.setdefault(normalized, field_mapping.internal_field)
+    # Lowercased variants resolve to the same field, so most headers skip the regex
+    for field_mapping in _FIELD_MAPPINGS:
+        for lowered in field_mapping._exact:
+            lookup.setdefault(lowered, lookup[_NORM_RE.sub('', lowered)])
+    return lookup
+
+def _build_dtype_by_field() -> Dict[str, str]:
+    """Expected data type per internal field (first mapping wins)"""
+    dtype_by_field = {}
+    for field_mapping in _FIELD_MAPPINGS:
+        dtype_by_field.setdefault(field_mapping.internal_field, field_mapping.data_type)
+    return dtype_by_field
+
+# Built once at import; the mapping table is invariant across mapper instances
+_HEADER_LOOKUP = _build_header_lookup()
+_DTYPE_BY_FIELD = _build_dtype_by_field()
 
 class FlexibleCSVMapper:
     """Handles dynamic CSV header mapping for any CSV format"""
     
     def __init__(self):
-        # Define field mappings with multiple possible header variations
-        self.field_mappings = [
-            FieldMapping(
-                csv_headers=["Customer ID", "customer_id", "customerid", "CustomerID", "customer", "id"],
-                internal_field="customer_id",
-                required=True
-            ),
-            FieldMapping(
-                csv_headers=["Order ID", "order_id", "orderid", "OrderID", "order", "transaction_id", "Transaction ID"],
-                internal_field="order_id",
-                required=True
-            ),
-            FieldMapping(
-                csv_headers=["Date", "date", "created_date", "Created Date", "order_date", "Order Date", "timestamp"],
-                internal_field="date",
-                required=True,
-                data_type="datetime"
-            ),
-            FieldMapping(
-                csv_headers=["Time", "time", "created_time", "Created Time", "order_time", "Order Time"],
-                internal_field="time",
-                data_type="time"
-            ),
-            FieldMapping(
-                csv_headers=["Product Name", "product_name", "productname", "ProductName", "item", "Item Name", "product", "Product"],
-                internal_field="product_name",
-                required=True
-            ),
-            FieldMapping(
-                csv_headers=["Product Type", "product_type", "category", "Category", "type", "Type"],
-                internal_field="product_type",
-                data_type="str",
-                required=False
-            ),
-            FieldMapping(
-                csv_headers=["Product Price", "product_price", "productprice", "ProductPrice", "price", "unit_price", "Unit Price"],
-                internal_field="product_price",
-                data_type="float"
-            ),
-            FieldMapping(
-                csv_headers=["Quantity", "quantity", "qty", "Qty"],
-                internal_field="quantity",
-                data_type="int"
-            ),
-            FieldMapping(
-                csv_headers=["Subtotal", "subtotal", "Sub Total", "sub_total"],
-                internal_field="subtotal",
-                data_type="float"
-            ),
-            FieldMapping(
-                csv_headers=["Discount Amount", "discount_amount", "discountamount", "DiscountAmount", "discount", "Discount"],
-                internal_field="discount_amount",
-                data_type="float"
-            ),
-            FieldMapping(
-                csv_headers=["Total Amount", "total_amount", "totalamount", "TotalAmount", "total", "Total"],
-                internal_field="total_amount",
-                required=True,
-                data_type="float"
-            ),
-            FieldMapping(
-                csv_headers=["Tax Amount", "tax_amount", "taxamount", "TaxAmount", "tax", "Tax"],
-                internal_field="tax_amount",
-                data_type="float"
-            ),
-            FieldMapping(
-                csv_headers=["amount", "Amount"],
-                internal_field="total_amount",
-                data_type="float"
-            ),
-
-            FieldMapping(
-                csv_headers=["Customer Name", "customer_name", "customername", "CustomerName", "name", "Name", "Full Name", "full_name", "fullname"],
-                internal_field="customer_name"
-            ),
-            FieldMapping(
-                csv_headers=["Customer Email", "customer_email", "customeremail", "CustomerEmail", "email", "Email"],
-                internal_field="customer_email"
-            ),
-            FieldMapping(
-                csv_headers=["Payment Status", "payment_status", "paymentstatus", "PaymentStatus", "status", "Status"],
-                internal_field="payment_status"
-            ),
-            FieldMapping(
-                csv_headers=["Payment Method", "payment_method", "paymentmethod", "PaymentMethod", "method", "Method"],
-                internal_field="payment_method"
-            ),
-            FieldMapping(
-                csv_headers=["Referral Source", "referral_source", "referralsource", "ReferralSource", "source", "Source"],
-                internal_field="referral_source"
-            ),
-            # Stripe-specific fields
-            FieldMapping(
-                csv_headers=["Amount (in cents)", "amount_cents"],
-                internal_field="amount",
-                data_type="float"
-            ),
-            FieldMapping(
-                csv_headers=["Net Revenue", "net_revenue", "net_amount", "Net Amount"],
-                internal_field="net_amount",
-                data_type="float"
-            ),
-            FieldMapping(
-                csv_headers=["Amount Refunded", "amount_refunded", "amountrefunded", "AmountRefunded", "refunded"],
-                internal_field="amount_refunded",
-                data_type="float"
-            ),
-            FieldMapping(
-                csv_headers=["Fee", "fee", "Fee Amount", "fee_amount"],
-                internal_field="fee",
-                data_type="float"
-            ),
-            FieldMapping(
-                csv_headers=["Net", "net", "Net Amount", "net_amount"],
-                internal_field="net",
-                data_type="float"
-            ),
-            FieldMapping(
-                csv_headers=["Created (UTC)", "created_utc", "created", "Created", "created_at"],
-                internal_field="created_utc",
-                data_type="datetime"
-            )
-        ]
+        # The field mapping table and its lookups are built once at module level
+        self.field_mappings = _FIELD_MAPPINGS
+        self._lookup = _HEADER_LOOKUP
+        self._dtype_by_field = _DTYPE_BY_FIELD
+        
+        # Header mappings per header row, so uploads from the same export template skip the lookups
+        self._map_header_row = functools.lru_cache(maxsize=_HEADER_CACHE_SIZE)(self._build_header_mapping)
     
     def normalize_header(self, header: str) -> str:
         """Normalize header for better matching"""
-        return re.sub(r'[^a-zA-Z0-9]', '', header.lower())
+        return _NORM_RE.sub('', header.lower())
     
-    def find_best_match(self, csv_header: str, possible_headers: List[str]) -> bool:
-        """Find if CSV header matches any of the possible headers"""
-        # First try exact match (case-insensitive)
-        for possible in possible_headers:
-            if csv_header.lower() == possible.lower():
-                return True
-        
-        # Then try normalized match
-        normalized_csv = self.normalize_header(csv_header)
-        for possible in possible_headers:
-            if self.normalize_header(possible) == normalized_csv:
-                return True
-        return False
+    def is_known_header(self, csv_header: str) -> bool:
+        """Check if a CSV header maps to any internal field"""
+        return csv_header.lower() in self._lookup or self.normalize_header(csv_header) in self._lookup
+    
+    def find_best_match(self, csv_header: str, field_mapping: FieldMapping) -> bool:
+        """Find if CSV header matches any of the field mapping's header variants"""
+        # Exact match (case-insensitive), then normalized match
+        return csv_header.lower() in field_mapping._exact or self.normalize_header(csv_header) in field_mapping._norm
     
     def map_headers(self, csv_headers: List[str]) -> Dict[str, str]:
         """Map CSV headers to internal field names"""
+        mapping, unmapped_headers = self._map_header_row(tuple(csv_headers))
+        # Hand out copies so callers can't modify the cached mapping
+        return dict(mapping), list(unmapped_headers)
+    
+    def _build_header_mapping(self, csv_headers: Tuple[str, ...]) -> Tuple[Dict[str, str], List[str]]:
+        """Map a header row to internal field names, returning the mapping and unmapped headers"""
         mapping = {}
         unmapped_headers = []
         
         for csv_header in csv_headers:
-            mapped = False
-            for field_mapping in self.field_mappings:
-                if self.find_best_match(csv_header, field_mapping.csv_headers):
-                    mapping[csv_header] = field_mapping.internal_field
-                    mapped = True
-                    break
-            
-            if not mapped:
+            internal_field = self._lookup.get(csv_header.lower()) or self._lookup.get(self.normalize_header(csv_header))
+            if internal_field:
+                mapping[csv_header] = internal_field
+            else:
                 unmapped_headers.append(csv_header)
         
         return mapping, unmapped_headers
@@ -184,8 +256,7 @@ class FlexibleCSVMapper:
             missing_fields = []
             
             # Check if we have the old format with exact field names
-            old_format_fields = ['Total Amount', 'Date', 'Product Name', 'Customer ID', 'Order ID']
-            if all(field in available_fields for field in old_format_fields):
+            if _OLD_FORMAT_FIELDS <= available_fields:
                 # Old format detected - all required fields are present
                 return []
             
@@ -210,52 +281,43 @@ class FlexibleCSVMapper:
         # Rename columns
         df_mapped = df.rename(columns=mapping)
         
-        # Apply data type conversions
-        for field_mapping in self.field_mappings:
-            if field_mapping.internal_field in df_mapped.columns:
+        # Apply data type conversions to the mapped columns that are present
+        # (duplicate column names can't be converted as a single Series)
+        columns = df_mapped.columns[~df_mapped.columns.duplicated(keep=False)]
+        # Columns the CSV parser already read as numbers need no coercion
+        numeric_cols = [
+            col for col in columns
+            if self._dtype_by_field.get(col) in ("float", "int") and not pd.api.types.is_numeric_dtype(df_mapped[col])
+        ]
+        if numeric_cols:
+            # Coerce all float/int columns in one batched pass
+            df_mapped[numeric_cols] = df_mapped[numeric_cols].apply(pd.to_numeric, errors='coerce')
+        
+        # Cast integer (quantities fit in 32 bits) and categorical columns with a single astype call
+        dtype_map = {col: 'Int32' for col in columns if self._dtype_by_field.get(col) == "int"}
+        dtype_map.update((col, 'category') for col in columns if col in _CATEGORICAL_FIELDS)
+        if dtype_map:
+            try:
+                df_mapped = df_mapped.astype(dtype_map)
+            except Exception:
+                # Fall back to casting column by column so one bad column keeps its original type
+                for col, dtype in dtype_map.items():
+                    try:
+                        df_mapped[col] = df_mapped[col].astype(dtype)
+                    except Exception as e:
+                        print(f"Warning: Could not convert {col} to {self._dtype_by_field.get(col)}: {e}")
+        
+        for col in columns:
+            if self._dtype_by_field.get(col) == "datetime":
                 try:
-                    if field_mapping.data_type == "float":
-                        df_mapped[field_mapping.internal_field] = pd.to_numeric(
-                            df_mapped[field_mapping.internal_field], errors='coerce'
-                        )
-                    elif field_mapping.data_type == "int":
-                        df_mapped[field_mapping.internal_field] = pd.to_numeric(
-                            df_mapped[field_mapping.internal_field], errors='coerce'
-                        ).astype('Int64')
-                    elif field_mapping.data_type == "datetime":
-                        try:
-                            df_mapped[field_mapping.internal_field] = pd.to_datetime(
-                                df_mapped[field_mapping.internal_field], errors='coerce'
-                            )
-                        except Exception as e:
-                            print(f"Warning: Could not parse datetime for {field_mapping.internal_field}: {e}")
-                            # Keep as string if datetime parsing fails
-                            pass
+                    df_mapped[col] = self.parse_datetime(df_mapped[col])
                 except Exception as e:
-                    # If conversion fails, keep the original data type
-                    print(f"Warning: Could not convert {field_mapping.internal_field} to {field_mapping.data_type}: {e}")
+                    print(f"Warning: Could not parse datetime for {col}: {e}")
+                    # Keep as string if datetime parsing fails
+                    pass
         
         # Add backward compatibility aliases for legacy code
-        compatibility_aliases = {
-            'total_amount': 'Total Amount',
-            'date': 'Date', 
-            'product_name': 'Product Name',
-            'customer_name': 'Customer Name',
-            'customer_email': 'Customer Email',
-            'order_id': 'Order ID',
-            'customer_id': 'Customer ID',
-            'quantity': 'Quantity',
-            'product_price': 'Product Price',
-            'tax_amount': 'Tax Amount',
-            'payment_status': 'Payment Status',
-            'payment_method': 'Payment Method',
-            'referral_source': 'Referral Source'
-        }
-        
-        # Create aliases for backward compatibility
-        for new_name, old_name in compatibility_aliases.items():
-            if new_name in df_mapped.columns and old_name not in df_mapped.columns:
-                df_mapped[old_name] = df_mapped[new_name]
+        df_mapped = self.add_compatibility_aliases(df_mapped, _COMPAT_ALIASES)
         
         # Handle malformed CSV where date and time are combined
         if 'date' in df_mapped.columns and df_mapped['date'].dtype == 'object':
@@ -264,16 +326,30 @@ class FlexibleCSVMapper:
                 # Check if the date field contains combined date-time-name
                 sample_date = str(df_mapped['date'].iloc[0])
                 if ' ' in sample_date and len(sample_date.split()) >= 2:
-                    # Extract just the date part (first part before space)
-                    df_mapped['date'] = df_mapped['date'].astype(str).str.split().str[0]
-                    # Try to parse the extracted date
-                    df_mapped['date'] = pd.to_datetime(df_mapped['date'], errors='coerce')
+                    # Extract just the date part (first token) in one regex pass and parse it
+                    df_mapped['date'] = self.parse_datetime(df_mapped['date'].str.extract(r'(\S+)', expand=False))
                     print("Extracted date from combined field")
             except Exception as e:
                 print(f"Could not extract date from combined field: {e}")
         
         return df_mapped
     
+    def parse_datetime(self, values: pd.Series) -> pd.Series:
+        """Parse datetimes, using pandas' C ISO-8601 parser when every value is ISO formatted"""
+        parsed = pd.to_datetime(values, format='ISO8601', errors='coerce')
+        if parsed.isna().sum() > values.isna().sum():
+            # Some values aren't ISO-8601, fall back to format inference
+            parsed = pd.to_datetime(values, errors='coerce', cache=True)
+        return parsed
+    
+    def add_compatibility_aliases(self, df: pd.DataFrame, aliases: Dict[str, str]) -> pd.DataFrame:
+        """Add alias columns (source name -> alias name) that are missing, in a single assign"""
+        missing = {
+            alias: df[source] for source, alias in aliases.items()
+            if source in df.columns and alias not in df.columns
+        }
+        return df.assign(**missing) if missing else df
+    
     def detect_csv_type(self, mapping: Dict[str, str]) -> str:
         """Detect if this is Stan or Stripe CSV based on mapped fields"""
         mapped_fields = set(mapping.values())
@@ -285,100 +361,96 @@ class FlexibleCSVMapper:
         else:
             return "unknown"
     
-    def fix_malformed_csv(self, file_content: str) -> str:
-        """Fix malformed CSV where addresses contain unquoted commas"""
-        lines = file_content.strip().split('\n')
-        if len(lines) < 2:
-            return file_content
-            
-        # Get header to determine expected number of columns
-        header_line = lines[0]
+    def fix_malformed_csv(self, file_content: Union[str, TextIO]) -> TextIO:
+        """Fix malformed CSV where addresses contain unquoted commas, returning a rewound text buffer"""
+        # Accept raw text or a text stream (e.g. an uploaded file) and walk it line by line
+        source = io.StringIO(file_content) if isinstance(file_content, str) else file_content
+        lines = (line.rstrip('\r\n') for line in source)
+        
+        # Get header (first non-blank line) to determine expected number of columns
+        header_line = next((line.strip() for line in lines if line.strip()), '')
         expected_cols = len(header_line.split(','))
         
-        fixed_lines = [header_line]  # Keep header as-is
+        fixed = io.StringIO()
+        fixed.write(header_line)  # Keep header as-is
+        writer = csv.writer(fixed, lineterminator='')
         
-        for line in lines[1:]:
-            columns = line.split(',')
+        for line in lines:
+            fixed.write('\n')
             
             # If we have more columns than expected, we need to merge some
-            if len(columns) > expected_cols:
-                # Find likely address field (usually contains state/country patterns)
-                # Look for patterns like "NY", "CA", "USA", "Australia", etc.
-                address_indicators = ['NY', 'CA', 'FL', 'TX', 'USA', 'Australia', 'Germany', 'UK', 'Canada']
-                
-                # Start from the end and work backwards to find address fields
-                fixed_columns = columns[:expected_cols-1]  # Take first part
-                remaining = columns[expected_cols-1:]  # Everything else becomes address
-                
-                # Join remaining parts as the address field (and quote it)
-                address_field = ','.join(remaining).strip()
-                if address_field and not (address_field.startswith('"') and address_field.endswith('"')):
-                    address_field = f'"{address_field}"'
-                
-                fixed_columns.append(address_field)
-                fixed_line = ','.join(fixed_columns)
-                fixed_lines.append(fixed_line)
-            else:
-                fixed_lines.append(line)
+            if line.count(',') >= expected_cols:
+                # Quoted fields may contain commas, so let the csv tokenizer split those lines
+                columns = next(csv.reader((line,))) if '"' in line else line.split(',')
+                if len(columns) > expected_cols:
+                    # Everything past the expected columns becomes the address field,
+                    # which csv.writer quotes since it contains commas
+                    columns[expected_cols - 1:] = [','.join(columns[expected_cols - 1:]).strip()]
+                    writer.writerow(columns)
+                    continue
+            
+            fixed.write(line)
         
-        return '\n'.join(fixed_lines)
+        fixed.seek(0)
+        return fixed
 
-    def process_csv(self, file_content: str) -> Tuple[pd.DataFrame, Dict[str, any]]:
+    def process_csv(self, file_content: Union[str, TextIO]) -> Tuple[pd.DataFrame, Dict[str, any]]:
         """Process any CSV file with automatic header mapping"""
         try:
             # First, try to fix malformed CSV
             fixed_content = self.fix_malformed_csv(file_content)
             
-            # Read CSV with proper handling of quoted fields
-            df = pd.read_csv(io.StringIO(fixed_content), quotechar='"', escapechar='\\')
+            # Fingerprint the content so callers can cache results per upload. The buffer
+            # is hashed in chunks so no full-size str/bytes copy of the upload is made.
+            hasher = hashlib.blake2b(digest_size=16)
+            for chunk in iter(lambda: fixed_content.read(_HASH_CHUNK_SIZE), ''):
+                hasher.update(chunk.encode('utf-8'))
+            fixed_content.seek(0)
+            content_hash = hasher.hexdigest()
+            
+            # Read the header row first so unmapped columns can be skipped while parsing
+            header = pd.read_csv(fixed_content, nrows=0, quotechar='"', escapechar='\\').columns
+            fixed_content.seek(0)
+            original_headers = header.str.strip().str.replace('"', '').tolist()
+            mapping, unmapped_headers = self.map_headers(original_headers)
+            
+            # Check if this is the old format with exact field names
+            is_old_format = _OLD_FORMAT_FIELDS <= frozenset(original_headers)
+            
+            # Read CSV with proper handling of quoted fields. The old format keeps every
+            # column; otherwise unmapped columns are skipped while parsing.
+            if is_old_format:
+                usecols = None
+            else:
+                known_columns = {raw for raw, clean in zip(header, original_headers) if clean in mapping}
+                usecols = lambda col: col in known_columns
+            df = pd.read_csv(fixed_content, quotechar='"', escapechar='\\', usecols=usecols)
             
             # Clean column names
             df.columns = df.columns.str.strip().str.replace('"', '')
             
-            # Check if this is the old format with exact field names
-            old_format_fields = ['Total Amount', 'Date', 'Product Name', 'Customer ID', 'Order ID']
-            if all(field in df.columns for field in old_format_fields):
+            if is_old_format:
                 # This is the old format - use it as-is with backward compatibility
                 print("Detected old CSV format - using direct mapping")
-                df_mapped = df.copy()
-                
-                # Add backward compatibility aliases
-                compatibility_aliases = {
-                    'Total Amount': 'total_amount',
-                    'Date': 'date', 
-                    'Product Name': 'product_name',
-                    'Customer Name': 'customer_name',
-                    'Customer Email': 'customer_email',
-                    'Order ID': 'order_id',
-                    'Customer ID': 'customer_id',
-                    'Quantity': 'quantity',
-                    'Product Price': 'product_price',
-                    'Tax Amount': 'tax_amount',
-                    'Payment Status': 'payment_status',
-                    'Payment Method': 'payment_method',
-                    'Referral Source': 'referral_source'
-                }
-                
-                # Create aliases for new field names
-                for old_name, new_name in compatibility_aliases.items():
-                    if old_name in df_mapped.columns and new_name not in df_mapped.columns:
-                        df_mapped[new_name] = df_mapped[old_name]
+                # Add backward compatibility aliases for new field names (assign returns
+                # a new frame, so the parsed frame needs no explicit copy)
+                df_mapped = self.add_compatibility_aliases(df, _LEGACY_ALIASES)
                 
                 metadata = {
                     "csv_type": "stan",
-                    "original_headers": df.columns.tolist(),
-                    "mapped_headers": {col: col for col in df.columns},
+                    "original_headers": original_headers,
+                    "mapped_headers": {col: col for col in original_headers},
                     "unmapped_headers": [],
                     "missing_required_fields": [],
                     "mapping_success": True,
-                    "total_columns": len(df.columns),
-                    "mapped_columns": len(df.columns)
+                    "total_columns": len(original_headers),
+                    "mapped_columns": len(original_headers),
+                    "content_hash": content_hash
                 }
                 
                 return df_mapped, metadata
             
-            # New format - use flexible mapping
-            mapping, unmapped_headers = self.map_headers(df.columns.tolist())
+            # New format - use the flexible mapping computed from the header row
             
 
             
@@ -397,13 +469,14 @@ class FlexibleCSVMapper:
             # Prepare metadata
             metadata = {
                 "csv_type": csv_type,
-                "original_headers": df.columns.tolist(),
+                "original_headers": original_headers,
                 "mapped_headers": mapping,
                 "unmapped_headers": unmapped_headers,
                 "missing_required_fields": missing_fields,
                 "mapping_success": len(missing_fields) == 0,
-                "total_columns": len(df.columns),
-                "mapped_columns": len(mapping)
+                "total_columns": len(original_headers),
+                "mapped_columns": len(mapping),
+                "content_hash": content_hash
             }
             
             return df_mapped, metadata
@@ -419,17 +492,26 @@ class FlexibleCSVMapper:
             df_mapped['customer_id'] = df_mapped['customer_email'].astype(str)
         
         # Generate order_id from date + index if no order_id exists
-        if 'order_id' not in df_mapped.columns and 'date' in df_mapped.columns:
-            # Use the original date string if datetime parsing failed
-            if df_mapped['date'].isna().any():
-                # If date parsing failed, use the original date column
-                original_date_col = [col for col, mapped in mapping.items() if mapped == 'date'][0]
-                df_mapped['order_id'] = df_original[original_date_col].astype(str) + '_' + df_mapped.index.to_series().astype(str)
-            else:
-                df_mapped['order_id'] = df_mapped['date'].astype(str) + '_' + df_mapped.index.to_series().astype(str)
-        
-        # Also generate order_id if it's still missing (fallback)
+        # (concatenated as NumPy string arrays rather than object Series)
         if 'order_id' not in df_mapped.columns:
-            df_mapped['order_id'] = 'ORDER_' + df_mapped.index.to_series().astype(str)
+            # Flatten first so a MultiIndex (ragged rows in read_csv) stringifies as tuples
+            index_str = df_mapped.index.to_flat_index().astype(str).to_numpy(dtype=str)
+            
+            if 'date' in df_mapped.columns:
+                # Use the original date string if datetime parsing failed
+                if df_mapped['date'].isna().any():
+                    # If date parsing failed, use the original date column
+                    original_date_col = [col for col, mapped in mapping.items() if mapped == 'date'][0]
+                    date_str = df_original[original_date_col].astype(str).to_numpy(dtype=str)
+                else:
+                    date_str = df_mapped['date'].astype(str).to_numpy(dtype=str)
+                df_mapped['order_id'] = np.char.add(np.char.add(date_str, '_'), index_str)
+            else:
+                # Fallback when there is no date to build from
+                df_mapped['order_id'] = np.char.add('ORDER_', index_str)
         
         return df_mapped
+
+
+# Shared mapper instance; its lookup tables are read-only after construction
+default_mapper = FlexibleCSVMapper()
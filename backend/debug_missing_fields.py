@@ -3,8 +3,10 @@
 Debug script to identify missing fields in new CSV format
 """
 
-import pandas as pd
-from csv_mapper import FlexibleCSVMapper
+import csv
+import io
+from pathlib import Path
+from csv_mapper import default_mapper
 
 def debug_missing_fields():
     """Debug missing fields in new CSV format"""
@@ -13,15 +15,14 @@ def debug_missing_fields():
     print("=" * 60)
     
     # Test new CSV format
-    mapper = FlexibleCSVMapper()
+    mapper = default_mapper
     
-    # Read new CSV
-    df = pd.read_csv('../new_headers.csv')
-    test_content = df.head(2).to_csv(index=False)
+    # Read the first rows of the new CSV as raw text for the mapper
+    test_content = '\n'.join(Path('../new_headers.csv').read_text().splitlines()[:3])
     
-    print(f"Original headers: {list(df.columns)}")
+    print(f"Original headers: {next(csv.reader(io.StringIO(test_content)))}")
     print(f"Sample data:")
-    print(df.head(1).to_string())
+    print(test_content.splitlines()[1])
     
     # Process CSV
     df_mapped, meta = mapper.process_csv(test_content)
@@ -4,7 +4,7 @@ Step-by-step debug script to trace field mapping and generation
 """
 
 import pandas as pd
-from csv_mapper import FlexibleCSVMapper
+from csv_mapper import default_mapper
 
 def debug_step_by_step():
     """Debug the CSV processing step by step"""
@@ -16,7 +16,6 @@ def debug_step_by_step():
     print("STEP 1: Reading CSV")
     print("-" * 30)
     df = pd.read_csv('../new_headers.csv')
-    test_content = df.head(2).to_csv(index=False)
     print(f"Original headers: {list(df.columns)}")
     print(f"Sample data:")
     print(df.head(1).to_string())
@@ -24,7 +23,7 @@ def debug_step_by_step():
     # Step 2: Initialize mapper
     print("\nSTEP 2: Initialize mapper")
     print("-" * 30)
-    mapper = FlexibleCSVMapper()
+    mapper = default_mapper
     
     # Step 3: Check if old format detection
     print("\nSTEP 3: Check old format detection")
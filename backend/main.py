@@ -1,23 +1,51 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 import pandas as pd
+import numpy as np
 import io
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, TextIO, Tuple, Union
 from datetime import datetime
 import uvicorn
 from pydantic import BaseModel
 from smart_ml_engine import SmartCachingMLEngine
 import time
-from csv_mapper import FlexibleCSVMapper
+import asyncio
+import threading
+from collections import OrderedDict
+from csv_mapper import default_mapper
 
 app = FastAPI(title="Stanlytics API", version="1.0.0")
 
-# Initialize Smart Caching ML Engine (loads instantly, no synthetic data!)
-ml_engine = SmartCachingMLEngine()
+# Smart Caching ML Engine, created on first use so startup and /health don't wait on it
+shared_ml_engine: Optional[SmartCachingMLEngine] = None
+ml_engine_lock = threading.Lock()
 
-# Initialize the flexible CSV mapper
-csv_mapper = FlexibleCSVMapper()
+def get_ml_engine() -> SmartCachingMLEngine:
+    """Return the shared ML engine, creating it once even under concurrent first requests"""
+    global shared_ml_engine
+    if shared_ml_engine is None:
+        with ml_engine_lock:
+            if shared_ml_engine is None:
+                shared_ml_engine = SmartCachingMLEngine()
+    return shared_ml_engine
+
+# Reuse the shared flexible CSV mapper (header lookup tables are built once)
+csv_mapper = default_mapper
+
+# Most products charted in the hour/weekday heatmap
+HEATMAP_TOP_N = 20
+
+# Weekday names indexed by pandas' dayofweek codes (Monday=0)
+DAY_NAMES = np.array(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])
+
+# Recent analytics results keyed by the uploads' content hashes, so re-uploading
+# the same export skips the aggregations and ML passes. Entries hold only the
+# aggregates; the per-order breakdown grows with the upload and is rebuilt per request.
+ANALYTICS_CACHE_SIZE = 8
+analytics_cache: "OrderedDict[Tuple[str, Optional[str]], Dict[str, Any]]" = OrderedDict()
+analytics_cache_lock = threading.Lock()
 
 # CORS setup for frontend communication
 app.add_middleware(
@@ -49,150 +77,199 @@ class AnalyticsResponse(BaseModel):
     order_breakdown: List[Dict[str, Any]]
     csv_metadata: Optional[Dict[str, Any]] = None
 
-def parse_stan_csv(file_content: str) -> pd.DataFrame:
+def parse_stan_csv(file_content: Union[str, TextIO]) -> pd.DataFrame:
     """Parse Stan Store CSV data"""
     try:
-        # Read CSV content
-        df = pd.read_csv(io.StringIO(file_content))
+        # Read CSV content (text streams such as an upload are parsed directly)
+        df = pd.read_csv(io.StringIO(file_content) if isinstance(file_content, str) else file_content)
         
         # Clean column names (remove quotes and whitespace)
         df.columns = df.columns.str.strip().str.replace('"', '')
         
         # Convert numeric columns
         numeric_columns = ['Product Price', 'Quantity', 'Subtotal', 'Discount Amount', 'Tax Amount', 'Total Amount']
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+        # Columns the CSV parser already read as numbers need no coercion
+        numeric_columns = [
+            col for col in numeric_columns
+            if col in df.columns and not pd.api.types.is_numeric_dtype(df[col])
+        ]
+        if numeric_columns:
+            df[numeric_columns] = df[numeric_columns].apply(pd.to_numeric, errors='coerce')
         
         # Parse dates
         if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+            df['Date'] = csv_mapper.parse_datetime(df['Date'])
+        
+        # Store the low-cardinality grouping keys as categoricals
+        category_columns = [col for col in ['Product Name', 'Referral Source'] if col in df.columns]
+        if category_columns:
+            df = df.astype({col: 'category' for col in category_columns})
             
         return df
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error parsing Stan CSV: {str(e)}")
 
-def parse_csv_flexible(file_content: str) -> Tuple[pd.DataFrame, Dict[str, any]]:
+def parse_csv_flexible(file_content: Union[str, TextIO]) -> Tuple[pd.DataFrame, Dict[str, any]]:
     """Parse any CSV file with automatic header mapping"""
     return csv_mapper.process_csv(file_content)
 
-def calculate_analytics(stan_df: pd.DataFrame, stripe_df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+def calculate_analytics_cached(
+    cache_key: Tuple[str, Optional[str]], stan_df: pd.DataFrame, stripe_df: Optional[pd.DataFrame] = None,
+    include_orders: bool = True
+) -> Dict[str, Any]:
+    """Return cached analytics for previously seen uploads, calculating them otherwise"""
+    with analytics_cache_lock:
+        analytics = analytics_cache.get(cache_key)
+        if analytics is not None:
+            analytics_cache.move_to_end(cache_key)
+    
+    if analytics is None:
+        analytics = calculate_analytics(stan_df, stripe_df, include_orders=False)
+        with analytics_cache_lock:
+            analytics_cache[cache_key] = analytics
+            if len(analytics_cache) > ANALYTICS_CACHE_SIZE:
+                analytics_cache.popitem(last=False)
+    
+    # Callers add their own keys, so hand out a shallow copy
+    analytics = dict(analytics)
+    if include_orders:
+        analytics['order_breakdown'] = build_order_breakdown(stan_df)
+    return analytics
+
+def build_order_breakdown(stan_df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Per-order breakdown, built column-wise instead of row by row"""
+    return pd.DataFrame({
+        'product_name': stan_df['product_name'],
+        'revenue': stan_df['total_amount'].astype('float64'),
+        'quantity_sold': stan_df['quantity'].fillna(1).astype('int64') if 'quantity' in stan_df.columns else 1,
+        'order_id': stan_df['order_id'],
+        'customer_id': stan_df['customer_id']
+    }).to_dict(orient='records')
+
+def calculate_analytics(
+    stan_df: pd.DataFrame, stripe_df: Optional[pd.DataFrame] = None, include_orders: bool = True
+) -> Dict[str, Any]:
     """Calculate comprehensive analytics from the data using real ML models"""
     
     # Basic revenue calculations from Stan data using standardized field names
     total_revenue = stan_df['total_amount'].sum()
     total_orders = len(stan_df)
 
-    order_level_breakdown = []
-
-    for _, row in stan_df.iterrows():
-        order_level_breakdown.append({
-            'product_name': row['product_name'],
-            'revenue': float(row['total_amount']),
-            'quantity_sold': int(row['quantity']) if 'quantity' in row and pd.notna(row['quantity']) else 1,
-            'order_id': row['order_id'],
-            'customer_id': row['customer_id']
-        })
+    # Per-order breakdown (skipped when the client doesn't need the order list)
+    order_level_breakdown = build_order_breakdown(stan_df) if include_orders else []
     
     # Product breakdown
-    product_breakdown = []
     agg_dict = {
         'total_amount': 'sum',
-        'order_id': 'count'
+        'order_id': 'size'
     }
     if 'quantity' in stan_df.columns:
         agg_dict['quantity'] = 'sum'
     
-    product_stats = stan_df.groupby('product_name').agg(agg_dict).reset_index()
+    # Dated breakdowns need a parsed date column with at least one value
+    has_dates = (
+        'date' in stan_df.columns
+        and stan_df['date'].dtype == 'datetime64[ns]'
+        and stan_df['date'].notna().any()
+    )
+    if has_dates:
+        # Aggregate the orders once at (month, product) grain and reduce the
+        # product and monthly breakdowns from that much smaller frame.
+        # dropna=False keeps undated orders and unnamed products for the
+        # coarser grains; the level groupbys below drop them as before.
+        # Only the reduced frames are sorted, not the per-order groupby.
+        monthly_product_stats = stan_df.groupby([
+            stan_df['date'].dt.to_period('M'),
+            'product_name'
+        ], sort=False, dropna=False, observed=True).agg(agg_dict)
+        product_stats = monthly_product_stats.groupby(level='product_name', observed=True).sum().reset_index()
+        monthly_stats = monthly_product_stats.groupby(level='date', observed=True).sum().reset_index()
+        monthly_product_stats = monthly_product_stats.reset_index().dropna(subset=['date', 'product_name'])
+    else:
+        product_stats = stan_df.groupby('product_name', observed=True).agg(agg_dict).reset_index()
     
-    for _, row in product_stats.iterrows():
-        product_breakdown.append({
-            'product_name': row['product_name'],
-            'revenue': float(row['total_amount']),
-            'quantity_sold': int(row['quantity']) if 'quantity' in row and pd.notna(row['quantity']) else 0,
-            'order_count': int(row['order_id'])
-        })
+    # The aggregated frames are converted to records column-wise rather than row by row
+    product_breakdown = pd.DataFrame({
+        'product_name': product_stats['product_name'],
+        'revenue': product_stats['total_amount'].astype('float64'),
+        'quantity_sold': product_stats['quantity'].fillna(0).astype('int64') if 'quantity' in product_stats.columns else 0,
+        'order_count': product_stats['order_id'].astype('int64')
+    }).sort_values('revenue', ascending=False, kind='stable').to_dict(orient='records')
     
     # Monthly revenue breakdown
     monthly_revenue = []
-    if 'date' in stan_df.columns and stan_df['date'].dtype == 'datetime64[ns]':
-        monthly_stats = stan_df.groupby(stan_df['date'].dt.to_period('M')).agg({
-            'total_amount': 'sum',
-            'order_id': 'count'
-        }).reset_index()
-        
-        for _, row in monthly_stats.iterrows():
-            monthly_revenue.append({
-                'month': str(row['date']),
-                'revenue': float(row['total_amount']),
-                'orders': int(row['order_id'])
-            })
+    if has_dates:
+        monthly_revenue = pd.DataFrame({
+            'month': monthly_stats['date'].astype(str),
+            'revenue': monthly_stats['total_amount'].astype('float64'),
+            'orders': monthly_stats['order_id'].astype('int64')
+        }).to_dict(orient='records')
     
-    # Monthly product-wise revenue breakdown
+    # Monthly product-wise revenue breakdown (months in order, top products first)
     monthly_product_revenue = []
-    if 'date' in stan_df.columns and stan_df['date'].dtype == 'datetime64[ns]':
-        agg_dict = {
-            'total_amount': 'sum',
-            'order_id': 'count'
-        }
-        if 'quantity' in stan_df.columns:
-            agg_dict['quantity'] = 'sum'
-        
-        monthly_product_stats = stan_df.groupby([
-            stan_df['date'].dt.to_period('M'), 
-            'product_name'
-        ]).agg(agg_dict).reset_index()
-        
-        for _, row in monthly_product_stats.iterrows():
-            monthly_product_revenue.append({
-                'month': str(row['date']),
-                'product_name': row['product_name'],
-                'revenue': float(row['total_amount']),
-                'quantity': int(row['quantity']) if 'quantity' in row and pd.notna(row['quantity']) else 0,
-                'orders': int(row['order_id'])
-            })
+    if has_dates:
+        monthly_product_revenue = pd.DataFrame({
+            'month': monthly_product_stats['date'].astype(str),
+            'product_name': monthly_product_stats['product_name'],
+            'revenue': monthly_product_stats['total_amount'].astype('float64'),
+            'quantity': monthly_product_stats['quantity'].fillna(0).astype('int64') if 'quantity' in monthly_product_stats.columns else 0,
+            'orders': monthly_product_stats['order_id'].astype('int64')
+        }).sort_values(['month', 'revenue'], ascending=[True, False]).to_dict(orient='records')
     
     # Product heatmap data (hour of day vs day of week)
     product_heatmap_data = []
-    if 'date' in stan_df.columns and 'time' in stan_df.columns:
-        # Only create DateTime if date parsing was successful and no NaT values
-        if stan_df['date'].dtype == 'datetime64[ns]' and not stan_df['date'].isna().all():
-            stan_df['DateTime'] = pd.to_datetime(stan_df['date'].astype(str) + ' ' + stan_df['time'].astype(str))
-            stan_df['Hour'] = stan_df['DateTime'].dt.hour
-            stan_df['DayOfWeek'] = stan_df['DateTime'].dt.day_name()
-            
-            heatmap_stats = stan_df.groupby(['product_name', 'Hour', 'DayOfWeek']).agg({
-                'total_amount': 'sum',
-                'order_id': 'count'
-            }).reset_index()
+    # The heatmap is skipped if date parsing failed
+    if has_dates and 'time' in stan_df.columns:
+        # Large catalogs only chart their top products by revenue, which keeps
+        # the (product, hour, day) group count bounded
+        heatmap_orders = stan_df
+        if len(product_stats) > HEATMAP_TOP_N:
+            top_products = product_stats.nlargest(HEATMAP_TOP_N, 'total_amount')['product_name']
+            heatmap_orders = stan_df[stan_df['product_name'].isin(top_products)]
+        
+        # Add HH:MM:SS times to the parsed dates as timedeltas instead of
+        # concatenating strings and re-parsing every combined value
+        times = pd.to_datetime(heatmap_orders['time'].astype(str), format='%H:%M:%S', errors='coerce')
+        if times.isna().sum() == heatmap_orders['time'].isna().sum():
+            date_time = heatmap_orders['date'] + (times - pd.Timestamp('1900-01-01'))
         else:
-            # Skip heatmap if date parsing failed
-            heatmap_stats = pd.DataFrame()
+            # Some times use another format, let pandas parse the combined strings
+            date_time = pd.to_datetime(heatmap_orders['date'].astype(str) + ' ' + heatmap_orders['time'].astype(str))
         
-        for _, row in heatmap_stats.iterrows():
-            product_heatmap_data.append({
-                'product_name': row['product_name'],
-                'hour': int(row['Hour']),
-                'day_of_week': row['DayOfWeek'],
-                'revenue': float(row['total_amount']),
-                'order_count': int(row['order_id']),
-                'intensity': float(row['order_id'])
-            })
+        # Group on local hour / weekday-code keys rather than adding columns to
+        # stan_df; weekday codes are named once the groups are reduced.
+        # The heatmap is keyed by (product, hour, day), so groups are left unsorted
+        heatmap_stats = heatmap_orders.groupby([
+            'product_name',
+            date_time.dt.hour.rename('Hour'),
+            date_time.dt.dayofweek.rename('DayOfWeek')
+        ], sort=False, observed=True).agg({
+            'total_amount': 'sum',
+            'order_id': 'size'
+        }).reset_index()
+        
+        product_heatmap_data = pd.DataFrame({
+            'product_name': heatmap_stats['product_name'],
+            'hour': heatmap_stats['Hour'].astype('int64'),
+            'day_of_week': DAY_NAMES[heatmap_stats['DayOfWeek'].to_numpy(dtype='int64')],
+            'revenue': heatmap_stats['total_amount'].astype('float64'),
+            'order_count': heatmap_stats['order_id'].astype('int64'),
+            'intensity': heatmap_stats['order_id'].astype('float64')
+        }).to_dict(orient='records')
     
     # Referral source breakdown
     referral_sources = []
     if 'referral_source' in stan_df.columns:
-        referral_stats = stan_df.groupby('referral_source').agg({
+        referral_stats = stan_df.groupby('referral_source', observed=True).agg({
             'total_amount': 'sum',
-            'order_id': 'count'
+            'order_id': 'size'
         }).reset_index()
         
-        for _, row in referral_stats.iterrows():
-            referral_sources.append({
-                'source': row['referral_source'],
-                'revenue': float(row['total_amount']),
-                'orders': int(row['order_id'])
-            })
+        referral_sources = pd.DataFrame({
+            'source': referral_stats['referral_source'],
+            'revenue': referral_stats['total_amount'].astype('float64'),
+            'orders': referral_stats['order_id'].astype('int64')
+        }).sort_values('revenue', ascending=False, kind='stable').to_dict(orient='records')
     
     # Initialize default values
     stripe_fees = 0.0
@@ -202,10 +279,12 @@ def calculate_analytics(stan_df: pd.DataFrame, stripe_df: Optional[pd.DataFrame]
     
     # Enhanced calculations if Stripe data is available
     if stripe_df is not None and not stripe_df.empty:
-        stripe_fees = stripe_df['fee'].sum()
-        refund_count = len(stripe_df[stripe_df['amount_refunded'] > 0])
-        refund_amount = stripe_df['amount_refunded'].sum()
-        net_from_stripe = stripe_df['net'].sum()
+        # Reduce each column as a plain float array (NaN-skipping, like Series.sum)
+        stripe_fees = float(np.nansum(stripe_df['fee'].to_numpy(dtype='float64', na_value=np.nan)))
+        refunds = stripe_df['amount_refunded'].to_numpy(dtype='float64', na_value=np.nan)
+        refund_count = int(np.count_nonzero(refunds > 0))
+        refund_amount = float(np.nansum(refunds))
+        net_from_stripe = float(np.nansum(stripe_df['net'].to_numpy(dtype='float64', na_value=np.nan)))
         net_profit = net_from_stripe - refund_amount
     
     # Estimate Stan Store fees
@@ -216,21 +295,25 @@ def calculate_analytics(stan_df: pd.DataFrame, stripe_df: Optional[pd.DataFrame]
     # FAST PRE-TRAINED ML MODELS
     # ===================
     
-    ml_start_time = time.time()
+    ml_engine = get_ml_engine()
     
-    # 1. Quick Revenue Forecasting (< 1 second)
-    revenue_forecast, forecast_metrics = ml_engine.quick_revenue_forecast(stan_df, periods=7)
+    # Daily revenue is shared by the forecast fallback and the insights
+    daily_revenue = stan_df.groupby('date')['total_amount'].sum()
     
-    # 2. Fast Anomaly Detection (< 0.5 seconds)
-    anomalies, anomaly_metrics = ml_engine.quick_anomaly_detection(stan_df)
+    ml_start_time = time.time()
     
-    # 3. Rapid Customer Segmentation (< 1 second)
-    customer_segments, segmentation_metrics = ml_engine.quick_customer_segmentation(stan_df)
+    # 1-3. Revenue forecasting, anomaly detection and customer segmentation,
+    # run concurrently (< 1 second)
+    (
+        (revenue_forecast, forecast_metrics),
+        (anomalies, anomaly_metrics),
+        (customer_segments, segmentation_metrics)
+    ) = ml_engine.quick_all(stan_df, periods=7, daily_revenue=daily_revenue)
     
     ml_processing_time = time.time() - ml_start_time
     
     # 4. Generate ML-powered insights
-    ml_insights = generate_smart_ml_insights(stan_df, anomalies, customer_segments, revenue_forecast)
+    ml_insights = generate_smart_ml_insights(stan_df, anomalies, customer_segments, revenue_forecast, daily_revenue)
     
     # 5. Model performance metrics
     model_metrics = ml_engine.get_performance_metrics()
@@ -249,11 +332,11 @@ def calculate_analytics(stan_df: pd.DataFrame, stripe_df: Optional[pd.DataFrame]
         'refund_count': refund_count,
         'refund_amount': round(refund_amount, 2),
         'total_orders': total_orders,
-        'product_breakdown': sorted(product_breakdown, key=lambda x: x['revenue'], reverse=True),
-        'monthly_revenue': sorted(monthly_revenue, key=lambda x: x['month']),
-        'monthly_product_revenue': sorted(monthly_product_revenue, key=lambda x: (x['month'], x['revenue']), reverse=True),
+        'product_breakdown': product_breakdown,
+        'monthly_revenue': monthly_revenue,
+        'monthly_product_revenue': monthly_product_revenue,
         'product_heatmap_data': product_heatmap_data,
-        'referral_sources': sorted(referral_sources, key=lambda x: x['revenue'], reverse=True),
+        'referral_sources': referral_sources,
         'ml_insights': ml_insights,
         'revenue_forecast': revenue_forecast,
         'anomalies': anomalies,
@@ -262,14 +345,15 @@ def calculate_analytics(stan_df: pd.DataFrame, stripe_df: Optional[pd.DataFrame]
         'order_breakdown': order_level_breakdown
     }
 
-def generate_smart_ml_insights(stan_df, anomalies, customer_segments, revenue_forecast):
+def generate_smart_ml_insights(stan_df, anomalies, customer_segments, revenue_forecast, daily_revenue=None):
     """Generate intelligent insights based on real user data only (no synthetic data)"""
     insights = []
     
     # Revenue forecast insights (based on actual user patterns)
     if revenue_forecast and len(revenue_forecast) > 0:
         # Calculate trend from user's actual data
-        daily_revenue = stan_df.groupby('date')['total_amount'].sum()
+        if daily_revenue is None:
+            daily_revenue = stan_df.groupby('date')['total_amount'].sum()
         recent_avg = daily_revenue.tail(7).mean() if len(daily_revenue) >= 7 else daily_revenue.mean()
         forecast_avg = sum(f['predicted_revenue'] for f in revenue_forecast) / len(revenue_forecast)
         
@@ -282,7 +366,7 @@ def generate_smart_ml_insights(stan_df, anomalies, customer_segments, revenue_fo
                 'message': f'Based on your actual sales patterns, we predict {growth_rate:.1f}% revenue increase next week.',
                 'action': 'Consider increasing inventory or marketing spend to capitalize on this trend.',
                 'confidence': 85,
-                'source': 'Lightweight RandomForest trained on your data'
+                'source': 'Lightweight gradient boosting trained on your data'
             })
         elif forecast_avg < recent_avg * 0.9:
             decline_rate = (1 - (forecast_avg / recent_avg)) * 100
@@ -293,7 +377,7 @@ def generate_smart_ml_insights(stan_df, anomalies, customer_segments, revenue_fo
                 'message': f'Your sales patterns suggest {decline_rate:.1f}% revenue decrease next week.',
                 'action': 'Review recent marketing campaigns and consider promotional strategies.',
                 'confidence': 82,
-                'source': 'Lightweight RandomForest trained on your data'
+                'source': 'Lightweight gradient boosting trained on your data'
             })
     
     # Anomaly insights (from actual user data patterns)
@@ -366,16 +450,30 @@ async def root():
 @app.post("/analyze", response_model=AnalyticsResponse)
 async def analyze_data(
     stan_file: UploadFile = File(...),
-    stripe_file: Optional[UploadFile] = File(None)
+    stripe_file: Optional[UploadFile] = File(None),
+    include_orders: bool = True
 ):
     """
-    Analyze uploaded CSV files with flexible header mapping
+    Analyze uploaded CSV files with flexible header mapping.
+    Pass include_orders=false to leave the per-order breakdown out of the response.
     """
     try:
-        # Read and process Stan Store file
-        stan_content = await stan_file.read()
-        stan_csv_content = stan_content.decode('utf-8')
-        stan_df, stan_metadata = parse_csv_flexible(stan_csv_content)
+        # Stream the spooled uploads straight into the parser instead of
+        # materializing the raw bytes and a decoded copy. Parsing runs in the
+        # threadpool so the event loop keeps serving other requests, and the
+        # Stan and Stripe files are parsed concurrently.
+        stan_parse = run_in_threadpool(
+            parse_csv_flexible, io.TextIOWrapper(stan_file.file, encoding='utf-8')
+        )
+        stripe_df = None
+        stripe_metadata = None
+        if stripe_file:
+            (stan_df, stan_metadata), (stripe_df, stripe_metadata) = await asyncio.gather(
+                stan_parse,
+                run_in_threadpool(parse_csv_flexible, io.TextIOWrapper(stripe_file.file, encoding='utf-8'))
+            )
+        else:
+            stan_df, stan_metadata = await stan_parse
         
         # Validate Stan data
         if not stan_metadata["mapping_success"]:
@@ -385,16 +483,11 @@ async def analyze_data(
                 detail=f"Missing required fields: {missing_fields}. Please ensure your CSV contains fields for customer_id, order_id, date, product_name, and total_amount."
             )
         
-        # Read and process Stripe file if provided
-        stripe_df = None
-        stripe_metadata = None
-        if stripe_file:
-            stripe_content = await stripe_file.read()
-            stripe_csv_content = stripe_content.decode('utf-8')
-            stripe_df, stripe_metadata = parse_csv_flexible(stripe_csv_content)
-        
-        # Calculate analytics
-        analytics = calculate_analytics(stan_df, stripe_df)
+        # Calculate analytics (reused when the same files were analyzed recently).
+        # The aggregations and ML passes run in the threadpool as well, so /health
+        # and concurrent uploads aren't blocked behind them
+        cache_key = (stan_metadata["content_hash"], stripe_metadata["content_hash"] if stripe_metadata else None)
+        analytics = await run_in_threadpool(calculate_analytics_cached, cache_key, stan_df, stripe_df, include_orders)
         
         # Add mapping metadata to response
         analytics['csv_metadata'] = {
@@ -1,5 +1,5 @@
 import csv
-from collections import defaultdict
+from array import array
 from utils import calculate_fees
 
 
@@ -14,7 +14,11 @@ def detect_csv_type(header_line):
 def parse_stan_csv(lines):
     reader = csv.DictReader(lines)
     total_revenue = 0
-    product_sales = defaultdict(lambda: {"revenue": 0, "units": 0})
+    # Per-product totals live in flat arrays indexed by each product's first-seen position
+    product_ids = {}
+    product_revenue = array("d")
+    product_units = array("q")
+    total_units = 0
     refund_count = 0
 
     for row in reader:
@@ -29,14 +33,26 @@ def parse_stan_csv(lines):
             quantity = int(row.get("Quantity", 1))
 
             total_revenue += amount
-            product_sales[product]["revenue"] += amount
-            product_sales[product]["units"] += quantity
+            total_units += quantity
+            pid = product_ids.get(product)
+            if pid is None:
+                pid = len(product_ids)
+                product_ids[product] = pid
+                product_revenue.append(0.0)
+                product_units.append(0)
+            product_revenue[pid] += amount
+            product_units[pid] += quantity
 
         except Exception as e:
             print("Error processing Stan row:", e)
 
     stan_fee = total_revenue * 0.10  # 10%
-    stripe_fee = (total_revenue * 0.029) + (0.30 * sum([v["units"] for v in product_sales.values()]))
+    stripe_fee = (total_revenue * 0.029) + (0.30 * total_units)
+
+    product_sales = {
+        product: {"revenue": product_revenue[pid], "units": product_units[pid]}
+        for product, pid in product_ids.items()
+    }
 
     return {
         "source": "Stan Store",
@@ -4,7 +4,7 @@ Test script to verify both old and new CSV formats work
 """
 
 import traceback
-from csv_mapper import FlexibleCSVMapper
+from csv_mapper import default_mapper
 from main import calculate_analytics
 import pandas as pd
 
@@ -17,7 +17,7 @@ def test_csv_format(csv_path, description):
     
     try:
         # Read and test the CSV
-        mapper = FlexibleCSVMapper()
+        mapper = default_mapper
         df = pd.read_csv(csv_path)
         test_content = df.head(5).to_csv(index=False)
         
@@ -4,12 +4,12 @@ Test script to verify field mappings are correct for both CSV formats
 """
 
 import pandas as pd
-from csv_mapper import FlexibleCSVMapper
+from csv_mapper import default_mapper
 
 def test_field_mapping():
     """Test field mapping for both CSV formats"""
     
-    mapper = FlexibleCSVMapper()
+    mapper = default_mapper
     
     print("=" * 80)
     print("TESTING FIELD MAPPING FOR BOTH CSV FORMATS")
@@ -40,8 +40,9 @@ def test_field_mapping():
     }
     
     print("\nExpected vs Actual mappings:")
+    mapped_new = meta_new['mapped_headers']
     for original, expected in expected_mappings_new.items():
-        actual = meta_new['mapped_headers'].get(original, 'NOT MAPPED')
+        actual = mapped_new.get(original, 'NOT MAPPED')
         status = "✅" if actual == expected else "❌"
         print(f"  {status} {original} → {expected} (got: {actual})")
     
@@ -67,8 +68,9 @@ CUS-001,STAN-20250117-2121,TRX-20250117-735956,2025-01-17,17:28:43,Phone Case,23
     }
     
     print("\nExpected vs Actual mappings (old format):")
+    mapped_old = meta_old['mapped_headers']
     for original, expected in expected_mappings_old.items():
-        actual = meta_old['mapped_headers'].get(original, 'NOT MAPPED')
+        actual = mapped_old.get(original, 'NOT MAPPED')
         status = "✅" if actual == expected else "❌"
         print(f"  {status} {original} → {expected} (got: {actual})")
     
@@ -76,17 +78,15 @@ CUS-001,STAN-20250117-2121,TRX-20250117-735956,2025-01-17,17:28:43,Phone Case,23
     print("\n3. REQUIRED FIELD CHECK")
     print("-" * 40)
     
-    required_fields = ['product_name', 'total_amount', 'customer_name', 'customer_email']
+    required_fields = pd.Index(['product_name', 'total_amount', 'customer_name', 'customer_email'])
     
     print("New CSV format:")
-    for field in required_fields:
-        has_field = field in df_new.columns or any(field in col for col in df_new.columns)
+    for field, has_field in zip(required_fields, required_fields.isin(df_new.columns)):
         status = "✅" if has_field else "❌"
         print(f"  {status} {field}: {has_field}")
     
     print("\nOld CSV format:")
-    for field in required_fields:
-        has_field = field in df_old.columns or any(field in col for col in df_old.columns)
+    for field, has_field in zip(required_fields, required_fields.isin(df_old.columns)):
         status = "✅" if has_field else "❌"
         print(f"  {status} {field}: {has_field}")
     
@@ -5,6 +5,7 @@ Test script to verify the new CSV processing works completely
 
 import traceback
 import sys
+from pathlib import Path
 from main import parse_csv_flexible, calculate_analytics
 
 def test_new_csv():
@@ -15,15 +16,15 @@ def test_new_csv():
     print("=" * 60)
     
     try:
-        # Read the new CSV file
-        print("1. Reading new_headers.csv...")
-        with open('../new_headers.csv', 'r') as f:
-            csv_content = f.read()
-        print(f"   ✓ File read successfully ({len(csv_content)} characters)")
+        # Open the new CSV file; the mapper reads it straight from the handle
+        print("1. Opening new_headers.csv...")
+        csv_path = Path('../new_headers.csv')
+        print(f"   ✓ File found ({csv_path.stat().st_size} bytes)")
         
         # Parse CSV
         print("\n2. Parsing CSV with flexible mapper...")
-        df, metadata = parse_csv_flexible(csv_content)
+        with csv_path.open('r') as f:
+            df, metadata = parse_csv_flexible(f)
         print(f"   ✓ CSV parsed successfully")
         print(f"   ✓ Mapping success: {metadata['mapping_success']}")
         print(f"   ✓ Rows: {len(df)}")
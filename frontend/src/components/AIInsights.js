@@ -362,7 +362,7 @@ const AIInsights = ({ data }) => {
             <p className="text-sm text-gray-600">
               {data.model_metrics?.forecast_performance?.cache_hit 
                 ? 'Using cached model trained on your data patterns' 
-                : `Lightweight RandomForest trained on ${data.model_metrics?.forecast_performance?.training_samples || 'your'} data points`}
+                : `Lightweight gradient boosting trained on ${data.model_metrics?.forecast_performance?.training_samples || 'your'} data points`}
             </p>
           </div>
           